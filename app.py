@@ -22,22 +22,29 @@ SNOWFLAKE_CONFIG = {
     'schema': 'YOUR_SNOWFLAKE_SCHEMA'
 }
 
-# --- Initial Database Setup (runs once on app startup) ---
-# Create a temporary db_connector instance ONLY for creating tables.
-# The db_connector for request handling is now in products_controller.py
-if DB_TYPE == 'mysql':
-    initial_db_connector = DatabaseConnector(db_type=DB_TYPE, **MYSQL_CONFIG)
-elif DB_TYPE == 'snowflake':
-    initial_db_connector = DatabaseConnector(db_type=DB_TYPE, **SNOWFLAKE_CONFIG)
-else:
-    raise ValueError("Invalid DB_TYPE specified. Must be 'mysql' or 'snowflake'.")
-
-with app.app_context():
-    conn = initial_db_connector.connect()
-    if conn:
-        initial_db_connector.create_tables()
-        initial_db_connector.close()
-# The 'initial_db_connector' instance is now out of scope and will be garbage collected.
+# --- Initial Database Setup ---
+# Kept out of module import: parser pool workers import this script as __mp_main__ and must not
+# connect to the database or create tables. Runs on `python app.py`, or via `flask --app app init-db`.
+# The db_connector for request handling is in products_controller.py
+def init_db():
+    '''Creates all tables using a temporary db_connector instance.'''
+    if DB_TYPE == 'mysql':
+        initial_db_connector = DatabaseConnector(db_type=DB_TYPE, **MYSQL_CONFIG)
+    elif DB_TYPE == 'snowflake':
+        initial_db_connector = DatabaseConnector(db_type=DB_TYPE, **SNOWFLAKE_CONFIG)
+    else:
+        raise ValueError("Invalid DB_TYPE specified. Must be 'mysql' or 'snowflake'.")
+
+    with app.app_context():
+        conn = initial_db_connector.connect()
+        if conn:
+            initial_db_connector.create_tables()
+            initial_db_connector.close()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Creates all database tables."""
+    init_db()
 
 @app.route('/')
 def root_index():
@@ -56,6 +63,11 @@ def api_scrape_route():
     """Triggers Amazon scraping and saves results to the database."""
     return products_controller.handle_api_scrape()
 
+@app.route('/api/reparse', methods=['POST'])
+def api_reparse_route():
+    """Rebuilds a product table from the raw page archive."""
+    return products_controller.handle_api_reparse()
+
 for category in products_controller.PRODUCT_CATEGORIES:
     @app.route(f'/api/{category}', methods=['GET'], endpoint=f'get_{category}_products')
     def get_category_products_route(cat=category):
@@ -67,6 +79,11 @@ def api_check_links_route():
     """Checks the HTTP status of provided URLs or all links in the database."""
     return products_controller.handle_api_check_links()
 
+@app.route('/api/links/dead', methods=['GET'])
+def get_dead_links_route():
+    """Retrieves stored links whose last health check failed."""
+    return products_controller.handle_get_dead_links()
+
 @app.route('/api/urls', methods=['POST'])
 def add_url_to_scrape_route():
     """Adds a URL to the list of URLs to be scraped."""
@@ -84,5 +101,6 @@ def delete_stored_url_route(url_id):
 
 
 if __name__ == '__main__':
+    init_db()
     app.run(host="0.0.0.0", port=5000, debug=True)
 
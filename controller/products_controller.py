@@ -1,9 +1,13 @@
 from flask import request
 from model.amazon_scraper import AmazonScraper
 from model.db_connector import DatabaseConnector
-from util.url_checker import check_url_status
+from model.scrape_pipeline import ScrapePipeline
+from model.page_archive import PageArchive, reparse_archive
+from util.url_checker import check_url_status, schedule_next_check
+from util.rate_limiter import configure_rate_limits, host_throttle
 from util.response_handler import success_response, error_response, info_response, not_found_response, bad_request_response
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 DB_TYPE = 'mysql' # <--- CHANGE THIS TO 'snowflake' IF YOU WANT TO USE SNOWFLAKE
 
@@ -23,16 +27,44 @@ SNOWFLAKE_CONFIG = {
     'schema': 'YOUR_SNOWFLAKE_SCHEMA'
 }
 
-scraper = AmazonScraper()
+# Per-host outbound request limits shared by the scraper and the link checker (see util/rate_limiter.py)
+RATE_LIMIT_CONFIG = {
+    'default': {'rate': 2.0, 'burst': 5},
+    'amazon.in': {'rate': 1.0, 'burst': 3, 'failure_rate_threshold': 0.3, 'reset_timeout': 60.0}
+}
+configure_rate_limits(RATE_LIMIT_CONFIG)
+
+PAGE_ARCHIVE_DIR = None # <--- SET TO A DIRECTORY (e.g. 'page_archive') TO KEEP RAW PAGES FOR RE-PARSING
+
+page_archive = PageArchive(PAGE_ARCHIVE_DIR) if PAGE_ARCHIVE_DIR else None
+scraper = AmazonScraper(archive=page_archive)
+
+# Optional read replicas (same keys as the configs above). Reads fall back to the primary when
+# no replica is reachable within MAX_REPLICA_LAG_SECONDS; read results are cached for QUERY_CACHE_TTL_SECONDS.
+MYSQL_READER_CONFIGS = []
+SNOWFLAKE_READER_CONFIGS = [] # e.g. the same account with a separate read-only warehouse
+MAX_REPLICA_LAG_SECONDS = 30
+QUERY_CACHE_TTL_SECONDS = 60
 
 if DB_TYPE == 'mysql':
-    db_connector = DatabaseConnector(db_type=DB_TYPE, **MYSQL_CONFIG)
+    db_connector = DatabaseConnector(db_type=DB_TYPE, reader_configs=MYSQL_READER_CONFIGS,
+                                     max_replica_lag_seconds=MAX_REPLICA_LAG_SECONDS,
+                                     cache_ttl_seconds=QUERY_CACHE_TTL_SECONDS, **MYSQL_CONFIG)
 elif DB_TYPE == 'snowflake':
-    db_connector = DatabaseConnector(db_type=DB_TYPE, **SNOWFLAKE_CONFIG)
+    db_connector = DatabaseConnector(db_type=DB_TYPE, reader_configs=SNOWFLAKE_READER_CONFIGS,
+                                     max_replica_lag_seconds=MAX_REPLICA_LAG_SECONDS,
+                                     cache_ttl_seconds=QUERY_CACHE_TTL_SECONDS, **SNOWFLAKE_CONFIG)
 else:
     raise ValueError("Invalid DB_TYPE specified in products_controller. Must be 'mysql' or 'snowflake'.")
 
 
+PRODUCTS_PREVIEW_SIZE = 10
+# Links are paced by RATE_LIMIT_CONFIG per host, so keep audit batches small; extra workers only help across hosts
+LINK_CHECK_BATCH_SIZE = 10
+LINK_CHECK_MAX_BATCH_SIZE = 30 # About 30 s per request at amazon.in's 1 req/s, leaving the rest of its budget to scraping
+LINK_CHECK_MAX_WORKERS = 8
+REPARSE_BATCH_SIZE = 500
+
 PRODUCT_CATEGORIES = [
     'products',
     'clothes',
@@ -46,8 +78,10 @@ PRODUCT_CATEGORIES = [
 
 def get_api_root_info():
     endpoints_info = {
-        "POST /api/scrape": "Scrape Amazon products from a given URL or all stored URLs. Requires 'url' or 'scrape_stored_urls': true in JSON body. (Inserts into 'products' table)",
-        "POST /api/check-links": "Check the HTTP status of provided URLs or all links in the database. Requires 'links' (list of URLs) or 'check_all_db_links': true in JSON body.",
+        "POST /api/scrape": "Scrape Amazon products from a given URL or all stored URLs. Requires 'url' or 'scrape_stored_urls': true in JSON body, optional 'max_pages' to follow result pages. (Inserts into 'products' table)",
+        "POST /api/check-links": "Check the HTTP status of provided URLs or of stored links due for re-checking. Requires 'links' (list of URLs) or 'check_all_db_links': true (optional 'limit') in JSON body.",
+        "GET /api/links/dead": "Retrieve stored links whose last check failed. Optional 'min_failures', 'limit' and 'offset' query parameters.",
+        "POST /api/reparse": "Rebuild a product table from the raw page archive without network access. Optional 'table' (default 'products') and 'replace': true to swap in a fresh rebuild instead of adding to the table.",
         "POST /api/urls": "Add a URL to the list of URLs to be scraped. Requires 'url' and optional 'description' in JSON body.",
         "GET /api/urls": "Retrieve all URLs stored for scraping.",
         "DELETE /api/urls/<int:url_id>": "Delete a URL from the stored list by its ID.",
@@ -93,18 +127,27 @@ def handle_api_scrape():
         else:
             return bad_request_response(message="Missing 'url' or 'scrape_stored_urls': true in request body.")
 
-        all_products_scraped = []
-        for url, url_id in urls_to_scrape:
-            print(f"API: Initiating scraping for URL: {url}")
-            products = scraper.scrape_products(url)
+        max_pages = data.get('max_pages')
+        if max_pages is not None and (not isinstance(max_pages, int) or isinstance(max_pages, bool) or max_pages < 1):
+            return bad_request_response(message="'max_pages' must be a positive integer.")
+
+        pipeline = ScrapePipeline(scraper, db_connector, table_name='products')
+        products_preview = []
+        print(f"API: Initiating scraping for {len(urls_to_scrape)} URL(s).")
+        for product in pipeline.run([url for url, _ in urls_to_scrape], max_pages=max_pages):
+            total_scraped_count += 1
+            if len(products_preview) < PRODUCTS_PREVIEW_SIZE:
+                products_preview.append(product)
 
-            if products:
-                db_connector.insert_products_into_table('products', products)
+        if pipeline.write_error:
+            return error_response(message=f"Scraping stopped: saving products to the database failed ({pipeline.write_error}).")
+
+        for url, url_id in urls_to_scrape:
+            scraped_count = pipeline.products_per_url.get(url, 0)
+            if scraped_count:
                 if url_id:
                     db_connector.update_last_scraped_time(url_id)
-                total_scraped_count += len(products)
-                all_products_scraped.extend(products)
-                response_messages.append(f"Scraped {len(products)} products from {url}.")
+                response_messages.append(f"Scraped {scraped_count} products from {url}.")
             else:
                 response_messages.append(f"No products found or scraping failed for {url}.")
 
@@ -112,67 +155,178 @@ def handle_api_scrape():
             message=" | ".join(response_messages),
             data={
                 "total_scraped_count": total_scraped_count,
-                "products_preview": all_products_scraped[:10]
+                "products_preview": products_preview
             }
         )
     finally:
         db_connector.close()
 
-def get_products_by_category(category_name: str):
-    '''API logic to retrieve all products from a specific category table.'''
-    if category_name not in PRODUCT_CATEGORIES:
-        return not_found_response(message=f"Category '{category_name}' not found.")
+def handle_api_reparse():
+    '''API logic to rebuild a product table by re-parsing archived pages.'''
+    if not page_archive:
+        return bad_request_response(message="Page archive is not enabled. Set PAGE_ARCHIVE_DIR to use re-parsing.")
+
+    data = request.get_json(silent=True) or {}
+    table_name = data.get('table', 'products')
+    if table_name not in PRODUCT_CATEGORIES:
+        return not_found_response(message=f"Category '{table_name}' not found.")
+
+    if not page_archive.entries():
+        return info_response(message="The page archive is empty; nothing to re-parse.")
+
+    replace = bool(data.get('replace'))
 
     conn = db_connector.connect()
     if not conn:
-        return error_response(message="Could not connect to database to fetch products.")
-    
+        return error_response(message="Could not connect to database.")
+
     try:
-        products_from_db = db_connector.fetch_products_from_table(category_name)
+        # With 'replace', rebuild into a staging copy and only swap it in once every product was stored
+        target_table = table_name
+        if replace:
+            target_table = db_connector.create_staging_table(table_name)
+            if not target_table:
+                return error_response(message=f"Could not create a staging table to rebuild '{table_name}'.")
+
+        total_parsed_count = 0
+        failed_count = 0
+        batch = []
+
+        def flush(batch):
+            _, batch_failed = db_connector.insert_products_into_table(target_table, batch)
+            return batch_failed
+
+        try:
+            for product in reparse_archive(page_archive):
+                total_parsed_count += 1
+                batch.append(product)
+                if len(batch) >= REPARSE_BATCH_SIZE:
+                    failed_count += flush(batch)
+                    batch = []
+                    if replace and failed_count:
+                        break  # The rebuild is already incomplete; stop before parsing the rest
+            if batch and not (replace and failed_count):
+                failed_count += flush(batch)
+        except Exception as e:
+            if replace:
+                db_connector.drop_staging_table(target_table)
+                return error_response(message=f"Re-parsing the page archive failed; '{table_name}' was left unchanged. ({e})")
+            return error_response(message=f"Re-parsing the page archive failed after processing {total_parsed_count} products into '{table_name}'. ({e})")
+
+        if replace:
+            if failed_count:
+                db_connector.drop_staging_table(target_table)
+                return error_response(message=f"{failed_count} re-parsed products could not be stored; '{table_name}' was left unchanged.")
+            if not total_parsed_count:
+                db_connector.drop_staging_table(target_table)
+                return info_response(message=f"No products parsed from the page archive; '{table_name}' was left unchanged.")
+            if not db_connector.swap_in_staging_table(table_name, target_table):
+                db_connector.drop_staging_table(target_table)
+                return error_response(message=f"Could not swap the rebuilt table in; '{table_name}' was left unchanged.")
+        elif failed_count:
+            return error_response(message=f"Re-parsed {total_parsed_count} products, but {failed_count} could not be stored in '{table_name}'.")
+
         return success_response(
-            message=f"Retrieved {len(products_from_db)} products from the '{category_name}' table.",
-            data={"products": products_from_db}
+            message=f"Re-parsed {total_parsed_count} products from the page archive into '{table_name}'.",
+            data={"total_parsed_count": total_parsed_count, "replaced": replace}
         )
     finally:
         db_connector.close()
 
+def get_products_by_category(category_name: str):
+    '''API logic to retrieve all products from a specific category table.'''
+    if category_name not in PRODUCT_CATEGORIES:
+        return not_found_response(message=f"Category '{category_name}' not found.")
+
+    try:
+        products_from_db = db_connector.fetch_products_from_table(category_name)
+    except ConnectionError:
+        return error_response(message="Could not connect to database to fetch products.")
+
+    return success_response(
+        message=f"Retrieved {len(products_from_db)} products from the '{category_name}' table.",
+        data={"products": products_from_db}
+    )
+
+def check_links(links):
+    '''Checks links with one worker per distinct host (up to LINK_CHECK_MAX_WORKERS); results keep the input order.'''
+    links = list(links)
+    hosts = {host_throttle.host_for(link) for link in links}
+    with ThreadPoolExecutor(max_workers=max(1, min(len(hosts), LINK_CHECK_MAX_WORKERS))) as executor:
+        return list(executor.map(check_url_status, links))
+
 def handle_api_check_links():
-    '''API logic to check the HTTP status of provided URLs or all links in the database.'''
+    '''API logic to check the HTTP status of provided URLs or of stored links due for re-checking.'''
     data = request.get_json()
-    links_to_check = []
-    
+
     if data and data.get('check_all_db_links'):
+        limit = data.get('limit', LINK_CHECK_BATCH_SIZE)
+        if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= LINK_CHECK_MAX_BATCH_SIZE:
+            return bad_request_response(message=f"'limit' must be an integer between 1 and {LINK_CHECK_MAX_BATCH_SIZE}.")
+
         conn = db_connector.connect()
-        if conn:
-            all_db_links = set()
-            for category in PRODUCT_CATEGORIES:
-                products_in_category = db_connector.fetch_products_from_table(category)
-                for p in products_in_category:
-                    if p.get('link') and p['link'] != 'N/A':
-                        all_db_links.add(p['link'])
+        if not conn:
+            return error_response(message="Could not connect to database to fetch links for checking.")
+
+        try:
+            due_links = db_connector.get_links_due_for_check(limit=limit)
+            if not due_links:
+                return info_response(message="No stored links are due for re-checking.")
+
+            results = check_links(tracked['link'] for tracked in due_links)
+
+            health_updates = []
+            for tracked, result in zip(due_links, results):
+                if result.get('skipped'):
+                    # Host is being short-circuited; leave the link due so the next audit retries it
+                    continue
+                health_updates.append(schedule_next_check(
+                    result,
+                    previous_interval=tracked['check_interval_seconds'] or 0,
+                    consecutive_failures=tracked['consecutive_failures'] or 0
+                ))
+            db_connector.update_link_health(health_updates)
+        finally:
             db_connector.close()
-            links_to_check = list(all_db_links)
 
-            if not links_to_check:
-                return info_response(message="No valid links found in any product table to check.")
-        else:
-            return error_response(message="Could not connect to database to fetch links for checking.")
+        return success_response(
+            message=f"Checked {len(results)} links due for re-checking.",
+            data={"results": results}
+        )
     elif data and 'links' in data and isinstance(data['links'], list):
         links_to_check = [link for link in data['links'] if isinstance(link, str) and link.startswith("http")]
         if not links_to_check:
             return bad_request_response(message="No valid HTTP/HTTPS links provided in the 'links' list.")
+        if len(links_to_check) > LINK_CHECK_MAX_BATCH_SIZE:
+            return bad_request_response(message=f"At most {LINK_CHECK_MAX_BATCH_SIZE} links can be checked per request.")
     else:
         return bad_request_response(message="Invalid request. Provide 'links' (list of URLs) or set 'check_all_db_links': true.")
 
-    results = []
-    for link in links_to_check:
-        results.append(check_url_status(link))
+    results = check_links(links_to_check)
 
     return success_response(
         message=f"Checked {len(results)} links.",
         data={"results": results}
     )
 
+def handle_get_dead_links():
+    '''API logic to retrieve stored links whose last check failed.'''
+    min_failures = request.args.get('min_failures', default=1, type=int)
+    limit = request.args.get('limit', default=100, type=int)
+    offset = request.args.get('offset', default=0, type=int)
+    if min_failures < 1 or limit < 1 or offset < 0:
+        return bad_request_response(message="'min_failures' and 'limit' must be positive and 'offset' non-negative.")
+
+    try:
+        dead_links = db_connector.get_dead_links(min_consecutive_failures=min_failures, limit=limit, offset=offset)
+    except ConnectionError:
+        return error_response(message="Could not connect to database.")
+
+    return success_response(
+        message=f"Retrieved {len(dead_links)} dead links.",
+        data={"links": dead_links}
+    )
+
 def handle_add_url_to_scrape():
     '''API logic to add a URL to the list of URLs to be scraped.'''
     data = request.get_json()
@@ -197,18 +351,15 @@ def handle_add_url_to_scrape():
 
 def handle_get_stored_urls():
     '''API logic to retrieve all URLs stored for scraping.'''
-    conn = db_connector.connect()
-    if not conn:
-        return error_response(message="Could not connect to database.")
-    
     try:
         urls = db_connector.get_all_scrape_urls()
-        return success_response(
-            message=f"Retrieved {len(urls)} stored URLs.",
-            data={"urls": urls}
-        )
-    finally:
-        db_connector.close()
+    except ConnectionError:
+        return error_response(message="Could not connect to database.")
+
+    return success_response(
+        message=f"Retrieved {len(urls)} stored URLs.",
+        data={"urls": urls}
+    )
 
 def handle_delete_stored_url(url_id: int):
     '''API logic to delete a URL from the stored list by its ID.'''
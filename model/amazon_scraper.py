@@ -1,55 +1,167 @@
 import requests
 import bs4
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlparse, parse_qs, urlencode, urlunparse
+from util.rate_limiter import host_throttle, CircuitOpenError
+
+AMAZON_BASE_URL = "https://amazon.in"
+
+def parse_products_html(content):
+    '''Parses the product cards out of a single Amazon search results page'''
+    k = bs4.BeautifulSoup(content, "html.parser")
+    products = k.find_all("div", {"data-component-type": "s-search-result"})
+    product_list = []
+    for p in products:
+        name_tag = p.find("h2")
+        name = name_tag["aria-label"].strip() if name_tag and 'aria-label' in name_tag.attrs else "N/A"
+
+        price_whole = p.find("span", class_="a-price-whole")
+        price_fraction = p.find("span", class_="a-price-fraction")
+        price = "N/A"
+        if price_whole:
+            price = price_whole.text.strip()
+            if price_fraction:
+                price += price_fraction.text.strip()
+
+        rating_tag = p.find("span", class_="a-icon-alt")
+        rating = rating_tag.text.strip() if rating_tag else "N/A"
+
+        link_tag = p.find("a", class_="a-link-normal")
+        link = f"{AMAZON_BASE_URL}{link_tag['href']}" if link_tag and 'href' in link_tag.attrs else "N/A"
+
+        product_list.append({
+            "Product Name": name,
+            "Price": price,
+            "Rating": rating,
+            "Link": link
+        })
+    return product_list
+
+def parse_pagination(content):
+    '''
+    Reads the pagination strip of a search results page.
+    Returns (page_count, next_page_href); page_count is None when no numbered pages are shown.
+    '''
+    strainer = bs4.SoupStrainer(class_=["s-pagination-item", "s-pagination-next"])
+    k = bs4.BeautifulSoup(content, "html.parser", parse_only=strainer)
+
+    page_numbers = [int(tag.text.strip()) for tag in k.find_all(class_="s-pagination-item") if tag.text.strip().isdigit()]
+    page_count = max(page_numbers) if page_numbers else None
+
+    next_tag = k.find("a", class_="s-pagination-next")
+    next_href = next_tag["href"] if next_tag and 'href' in next_tag.attrs else None
+    return page_count, next_href
+
+def build_page_url(url, page_number):
+    '''Returns the search URL with its 'page' query parameter set to page_number'''
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query, keep_blank_values=True)
+    query['page'] = [str(page_number)]
+    return urlunparse(parsed._replace(query=urlencode(query, doseq=True)))
 
 class AmazonScraper:
     ''' Scrapes Amazon Ecommerce Products and provides data '''
 
-    def scrape_products(self, url):
-        '''Scrapes content from the given Amazon URL'''
+    HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+    MAX_PAGES_LIMIT = 20  # Hard upper bound on crawl depth, whatever the caller asks for
+    REQUEST_TIMEOUT = 10  # Seconds; a hung request must not pin a worker (or a circuit breaker trial) forever
+
+    def __init__(self, max_pages=5, max_workers=4, archive=None):
+        self.max_pages = max_pages
+        self.max_workers = max_workers
+        self.archive = archive  # Optional PageArchive keeping every fetched page for offline re-parsing
+
+    def _resolve_max_pages(self, max_pages):
+        '''Clamps a requested page count to the range [1, MAX_PAGES_LIMIT]'''
+        if max_pages is None:
+            max_pages = self.max_pages
+        return max(1, min(int(max_pages), self.MAX_PAGES_LIMIT))
+
+    def fetch_page(self, url):
+        '''Downloads a single page and returns its raw content, or None on failure'''
+        try:
+            ticket = host_throttle.before_request(url)
+        except CircuitOpenError as e:
+            print(f'Download skipped for URL: {url} - {e}')
+            return None
+
+        try:
+            r = requests.get(url, headers=self.HEADERS, timeout=self.REQUEST_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            host_throttle.record_response(url, ticket, None)
+            print(f'Download/request failed for URL: {url} - {e}')
+            return None
+
+        host_throttle.record_response(url, ticket, r.status_code)
         try:
-            r = requests.get(url, headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'})
             r.raise_for_status()
             print(f"Request Successful for URL: {url}")
+            if self.archive:
+                self.archive.append(url, r.content)
+            return r.content
         except requests.exceptions.RequestException as e:
             print(f'Download/request failed for URL: {url} - {e}')
-            return []
-
-        k = bs4.BeautifulSoup(r.content, "html.parser")
-        products = k.find_all("div", {"data-component-type": "s-search-result"})
-        product_list = []
-        for p in products:
-            name_tag = p.find("h2")
-            name = name_tag["aria-label"].strip() if name_tag and 'aria-label' in name_tag.attrs else "N/A"
-
-            price_whole = p.find("span", class_="a-price-whole")
-            price_fraction = p.find("span", class_="a-price-fraction")
-            price = "N/A"
-            if price_whole:
-                price = price_whole.text.strip()
-                if price_fraction:
-                    price += price_fraction.text.strip()
-
-            rating_tag = p.find("span", class_="a-icon-alt")
-            rating = rating_tag.text.strip() if rating_tag else "N/A"
-
-            link_tag = p.find("a", class_="a-link-normal")
-            link = f"https://amazon.in{link_tag['href']}" if link_tag and 'href' in link_tag.attrs else "N/A"
-
-            product_list.append({
-                "Product Name": name,
-                "Price": price,
-                "Rating": rating,
-                "Link": link
-            })
-        return product_list
-
-    def save_to_json(self, product_list, filename="products.json"):
-        product_json = json.dumps(product_list, indent=4)
+            return None
+
+    def fetch_pages(self, url, max_pages=None):
+        '''
+        Yields (page_number, content) for up to max_pages result pages of a search URL.
+        Once the page count is known from the first page, the remaining pages are fetched concurrently;
+        otherwise the "next page" links are followed one at a time.
+        '''
+        max_pages = self._resolve_max_pages(max_pages)
+
+        content = self.fetch_page(url)
+        if content is None:
+            return
+        yield 1, content
+        if max_pages == 1:
+            return
+
+        page_count, next_href = parse_pagination(content)
+        if page_count:
+            last_page = min(page_count, max_pages)
+            executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            try:
+                futures = {
+                    executor.submit(self.fetch_page, build_page_url(url, page_number)): page_number
+                    for page_number in range(2, last_page + 1)
+                }
+                for future in as_completed(futures):
+                    page_content = future.result()
+                    if page_content is not None:
+                        yield futures[future], page_content
+            finally:
+                # If the caller stopped early, drop queued fetches instead of waiting for each of them
+                executor.shutdown(wait=False, cancel_futures=True)
+            return
+
+        page_number = 1
+        while next_href and page_number < max_pages:
+            page_number += 1
+            content = self.fetch_page(urljoin(AMAZON_BASE_URL, next_href))
+            if content is None:
+                return
+            yield page_number, content
+            _, next_href = parse_pagination(content)
+
+    def scrape_products(self, url, max_pages=None):
+        '''Scrapes content from the given Amazon URL, following result pages up to max_pages'''
+        products_by_link = {}
+        unlinked_products = []
+        for page_number, content in self.fetch_pages(url, max_pages):
+            for product in parse_products_html(content):
+                if product["Link"] == "N/A":
+                    unlinked_products.append(product)
+                else:
+                    products_by_link.setdefault(product["Link"], product)
+        return list(products_by_link.values()) + unlinked_products
+
+    def save_to_json(self, product_list, filename="products.json", indent=None):
         try:
             with open(filename, "w") as json_file:
-                json_file.write(product_json)
+                json.dump(product_list, json_file, indent=indent)
             print(f"Products details saved in {filename}")
         except IOError as e:
             print(f"Error saving to JSON file {filename}: {e}")
-
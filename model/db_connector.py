@@ -1,14 +1,33 @@
 import mysql.connector
 from mysql.connector import Error as MySQL_Error
 import snowflake.connector
+import threading
+import time
+import uuid
 from datetime import datetime
+from model.query_cache import QueryCache
 
 class DatabaseConnector:
-    def __init__(self, db_type='mysql', **db_config):
+    def __init__(self, db_type='mysql', reader_configs=None, max_replica_lag_seconds=30,
+                 cache_ttl_seconds=60, cache_max_entries=256, **db_config):
         self.db_type = db_type
-        self.db_config = db_config
+        self.db_config = db_config  # Writer (primary) connection config
         self.conn = None
 
+        # Read-only methods go to these replicas when they are within max_replica_lag_seconds of the primary
+        self.reader_configs = list(reader_configs or [])
+        self.max_replica_lag_seconds = max_replica_lag_seconds
+        self.lag_check_interval_seconds = 5
+        self._reader_lag_checked_at = [0.0] * len(self.reader_configs)
+        self._reader_within_lag = [False] * len(self.reader_configs)
+        self._next_reader = 0
+        self._table_written_at = {}  # table -> monotonic time of the last write through this connector
+        self._reader_lock = threading.Lock()  # Guards the reader rotation, lag state and _table_written_at
+        # Read connections (readers and the primary fallback) are per thread, so concurrent requests never share one
+        self._local = threading.local()
+        self._read_conns = set()
+        self.query_cache = QueryCache(ttl_seconds=cache_ttl_seconds, max_entries=cache_max_entries)
+
         # Set default configurations if not provided (for development convenience)
         if self.db_type == 'mysql' and not self.db_config:
             self.db_config = {
@@ -34,44 +53,197 @@ class DatabaseConnector:
             print("Default Snowflake config used. Please update db_config in app.py or controller/products_controller.py with your actual Snowflake credentials.")
             print("--- End Snowflake Configuration Warning ---\n")
 
-    def connect(self):
-        '''Establishes a database connection.'''
-        if self.conn and self.conn.is_connected():
-            # print(f"Already connected to {self.db_type} database.") # Can be noisy
-            return self.conn
-
+    def _open_connection(self, config):
+        '''Opens a new connection with the given config, or returns None on failure.'''
+        conn = None
         try:
             if self.db_type == 'mysql':
-                self.conn = mysql.connector.connect(**self.db_config)
-                if self.conn.is_connected():
-                    print(f"Connected to MySQL database: {self.db_config.get('database')}")
+                conn = mysql.connector.connect(**config)
+                if conn.is_connected():
+                    print(f"Connected to MySQL database: {config.get('database')} on {config.get('host')}")
                 else:
                     print("Failed to connect to MySQL database.")
-                    self.conn = None
+                    conn = None
             elif self.db_type == 'snowflake':
-                self.conn = snowflake.connector.connect(**self.db_config)
-                print(f"Connected to Snowflake database: {self.db_config.get('database')}")
+                conn = snowflake.connector.connect(**config)
+                print(f"Connected to Snowflake database: {config.get('database')}")
             else:
                 print("Unsupported database type.")
-                self.conn = None
         except MySQL_Error as e:
             print(f"Error connecting to MySQL: {e}")
-            self.conn = None
+            conn = None
         except snowflake.connector.errors.ProgrammingError as e:
             print(f"Error connecting to Snowflake: {e}")
-            self.conn = None
+            conn = None
         except Exception as e:
             print(f"An unexpected error occurred during database connection: {e}")
-            self.conn = None
+            conn = None
+        return conn
+
+    def connect(self):
+        '''Establishes the writer (primary) database connection. Reader connections are opened on demand.'''
+        if self.conn and self.conn.is_connected():
+            # print(f"Already connected to {self.db_type} database.") # Can be noisy
+            return self.conn
+
+        self.conn = self._open_connection(self.db_config)
         return self.conn
 
     def close(self):
-        '''Closes the database connection.'''
+        '''Closes the writer connection. Read connections stay open for reuse; see close_readers().'''
         if self.conn and self.conn.is_connected():
             self.conn.close()
             # print("Database connection closed.") # Can be noisy
             self.conn = None
 
+    def close_readers(self):
+        '''Closes the read connections of every thread and forgets the readers' lag state (e.g. at shutdown).'''
+        with self._reader_lock:
+            read_conns, self._read_conns = self._read_conns, set()
+            for i in range(len(self.reader_configs)):
+                self._reader_lag_checked_at[i] = 0.0
+                self._reader_within_lag[i] = False
+        for conn in read_conns:
+            if conn.is_connected():
+                conn.close()
+
+    def _read_connection(self, key, config):
+        '''Returns the calling thread's read connection for `key` (a reader index or 'primary'), opening it if needed.'''
+        conns = getattr(self._local, 'conns', None)
+        if conns is None:
+            conns = self._local.conns = {}
+        conn = conns.get(key)
+        if conn and conn.is_connected():
+            return conn
+
+        new_conn = self._open_connection(config)
+        conns[key] = new_conn
+        with self._reader_lock:
+            self._read_conns.discard(conn)
+            if new_conn:
+                self._read_conns.add(new_conn)
+        return new_conn
+
+    def _replica_lag_seconds(self, conn):
+        '''Returns how far a reader is behind the primary, or None if replication is broken or unknown.'''
+        if self.db_type != 'mysql':
+            # Snowflake readers are separate warehouses over the same storage, so there is no lag
+            return 0
+
+        cursor = conn.cursor(dictionary=True)
+        try:
+            for status_query, lag_column in (("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+                                             ("SHOW SLAVE STATUS", "Seconds_Behind_Master")):
+                try:
+                    cursor.execute(status_query)
+                    row = cursor.fetchone()
+                except MySQL_Error:
+                    continue
+                if row is None:
+                    # Not configured as a replica (e.g. a second endpoint of the primary)
+                    return 0
+                return row.get(lag_column)
+            return None
+        finally:
+            cursor.close()
+
+    def _set_reader_health(self, i, within_lag):
+        with self._reader_lock:
+            self._reader_within_lag[i] = within_lag
+            self._reader_lag_checked_at[i] = time.monotonic()
+
+    def _pick_reader(self):
+        '''
+        Picks a reader round-robin, skipping readers that are down or lag more than max_replica_lag_seconds.
+        Returns (reader index, this thread's connection to it), or (None, None) when no reader qualifies.
+        A reader that is down or lagging stays out of rotation until its next lag check.
+        '''
+        for _ in range(len(self.reader_configs)):
+            with self._reader_lock:
+                i = self._next_reader
+                self._next_reader = (self._next_reader + 1) % len(self.reader_configs)
+                needs_lag_check = time.monotonic() - self._reader_lag_checked_at[i] >= self.lag_check_interval_seconds
+                within_lag = self._reader_within_lag[i]
+            if not needs_lag_check and not within_lag:
+                continue
+
+            reader_conn = self._read_connection(i, self.reader_configs[i])
+            if not reader_conn:
+                self._set_reader_health(i, False)
+                continue
+
+            if needs_lag_check:
+                try:
+                    lag = self._replica_lag_seconds(reader_conn)
+                except Exception as e:
+                    print(f"Error checking replica lag on reader {i}: {e}")
+                    lag = None
+                within_lag = lag is not None and lag <= self.max_replica_lag_seconds
+                self._set_reader_health(i, within_lag)
+                if not within_lag:
+                    print(f"Reader {i} skipped (replica lag: {lag}).")
+            if within_lag:
+                return i, reader_conn
+        return None, None
+
+    def _note_write(self, table_name):
+        '''
+        Records a write to table_name: its cached reads are dropped, and its reads go to the primary
+        for the next max_replica_lag_seconds, since an in-rotation replica may not have the write yet.
+        '''
+        with self._reader_lock:
+            self._table_written_at[table_name] = time.monotonic()
+        self.query_cache.invalidate_table(table_name)
+
+    def _written_since(self, tables, since):
+        with self._reader_lock:
+            return any(self._table_written_at.get(table, float('-inf')) >= since for table in tables)
+
+    def _execute_read(self, conn, query, params, lowercase_columns):
+        cursor = conn.cursor(dictionary=True) if self.db_type == 'mysql' else conn.cursor()
+        try:
+            cursor.execute(query, params)
+            if self.db_type == 'mysql':
+                return cursor.fetchall()
+            columns = [col[0].lower() if lowercase_columns else col[0] for col in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def _run_read_query(self, query, params=None, tables=(), lowercase_columns=False):
+        '''
+        Runs a read-only query and returns its rows as dicts. Cache hits never touch the database.
+        Goes to a reader (retrying on the primary if that reader fails), or straight to the primary while one of
+        `tables` was written through this connector within the replica lag window.
+        Results are cached until a write to one of `tables` goes through this connector (or the TTL expires).
+        Raises ConnectionError when neither a reader nor the primary is reachable.
+        '''
+        cache_key = QueryCache.make_key(query, params)
+        cached = self.query_cache.get(cache_key)
+        if cached is not QueryCache.MISS:
+            return cached
+
+        started_at = time.monotonic()
+        rows = None
+        if not self._written_since(tables, started_at - self.max_replica_lag_seconds):
+            i, reader_conn = self._pick_reader()
+            if reader_conn:
+                try:
+                    rows = self._execute_read(reader_conn, query, params, lowercase_columns)
+                except Exception as e:
+                    print(f"Read query failed on reader {i}, retrying on the primary: {e}")
+                    self._set_reader_health(i, False)
+        if rows is None:
+            primary_conn = self._read_connection('primary', self.db_config)
+            if not primary_conn:
+                raise ConnectionError("No reader or primary database connection available.")
+            rows = self._execute_read(primary_conn, query, params, lowercase_columns)
+
+        # A write that landed while the query ran may be missing from these rows; don't keep them around
+        if not self._written_since(tables, started_at):
+            self.query_cache.set(cache_key, rows, tables)
+        return rows
+
     def create_tables(self):
         '''Creates all necessary tables if they don't exist.'''
         if not self.conn or not self.conn.is_connected():
@@ -179,7 +351,58 @@ class DatabaseConnector:
                 ''')
             print(f"{self.db_type} table 'scrape_urls' ensured.")
 
+            # Create link_health table: one row per product link, scheduled for incremental re-checks
+            if self.db_type == 'mysql':
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS link_health (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        link VARCHAR(1024) NOT NULL,
+                        last_status_code INT,
+                        is_working BOOLEAN,
+                        last_error VARCHAR(512),
+                        last_checked_at TIMESTAMP NULL DEFAULT NULL,
+                        consecutive_failures INT NOT NULL DEFAULT 0,
+                        check_interval_seconds INT NOT NULL DEFAULT 0,
+                        next_check_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                        UNIQUE INDEX idx_link_health_link_unique (link(255)),
+                        INDEX idx_link_health_status (is_working, consecutive_failures),
+                        INDEX idx_link_health_next_check (next_check_at)
+                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+                ''')
+            elif self.db_type == 'snowflake':
+                # Kept across restarts (no OR REPLACE) so link history survives; Snowflake has no secondary indexes
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS link_health (
+                        id INT IDENTITY(1,1),
+                        link VARCHAR(1024) UNIQUE NOT NULL,
+                        last_status_code INT,
+                        is_working BOOLEAN,
+                        last_error VARCHAR(512),
+                        last_checked_at TIMESTAMP_NTZ,
+                        consecutive_failures INT DEFAULT 0,
+                        check_interval_seconds INT DEFAULT 0,
+                        next_check_at TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP
+                    );
+                ''')
+            print(f"{self.db_type} table 'link_health' ensured.")
+
+            # Make sure links already stored in product tables are tracked
+            for table_name in table_schemas:
+                if self.db_type == 'mysql':
+                    cursor.execute(f"""
+                        INSERT IGNORE INTO link_health (link)
+                        SELECT DISTINCT link FROM {table_name} WHERE link <> 'N/A'
+                    """)
+                elif self.db_type == 'snowflake':
+                    cursor.execute(f"""
+                        MERGE INTO link_health t
+                        USING (SELECT DISTINCT link FROM {table_name} WHERE link <> 'N/A') s
+                        ON t.link = s.link
+                        WHEN NOT MATCHED THEN INSERT (link) VALUES (s.link)
+                    """)
+
             self.conn.commit()
+            self.query_cache.clear()
         except (MySQL_Error, snowflake.connector.errors.ProgrammingError) as e:
             print(f"Error creating tables: {e}")
             self.conn.rollback()
@@ -190,26 +413,56 @@ class DatabaseConnector:
             cursor.close()
 
     def insert_products_into_table(self, table_name, products_data):
-        '''Inserts a list of product dictionaries into the specified table.'''
+        '''
+        Inserts a list of product dictionaries into the specified table.
+        Returns (inserted_count, failed_count); duplicates that were ignored count as neither.
+        '''
         if not self.conn or not self.conn.is_connected():
             print(f"No active database connection to insert products into {table_name}.")
-            return
+            return 0, len(products_data)
 
-        cursor = self.conn.cursor()
+        try:
+            cursor = self.conn.cursor()
+        except Exception as e:
+            print(f"Error opening a cursor to insert products into {table_name}: {e}")
+            return 0, len(products_data)
         inserted_count = 0
+        failed_count = 0
         insert_query = f"INSERT IGNORE INTO {table_name} (name, price, rating, link) VALUES (%s, %s, %s, %s)"
         if self.db_type == 'snowflake':
             # Snowflake doesn't have INSERT IGNORE, so we rely on UNIQUE constraint for duplicates
             insert_query = f"INSERT INTO {table_name} (name, price, rating, link) VALUES (%s, %s, %s, %s)"
 
-        for product in products_data:
-            name = product.get("Product Name")
-            price = product.get("Price")
-            rating = product.get("Rating")
-            link = product.get("Link")
+        rows = [
+            (product.get("Product Name"), product.get("Price"), product.get("Rating"), product.get("Link"))
+            for product in products_data
+        ]
+        if not rows:
+            cursor.close()
+            return 0, 0
+
+        # Write the whole batch in one round trip and one commit; fall back to row-by-row on failure
+        try:
+            cursor.executemany(insert_query, rows)
+            self.conn.commit()
+            self._note_write(table_name)
+            inserted_count = max(cursor.rowcount, 0)
+            print(f"Attempted to insert {len(rows)} products into {table_name}. Successfully inserted/ignored {inserted_count} new products.")
+            cursor.close()
+            self.register_links([row[3] for row in rows])
+            return inserted_count, 0
+        except Exception as e:
+            print(f"Bulk insert into {table_name} failed, retrying row by row: {e}")
+            try:
+                self.conn.rollback()
+            except Exception:
+                pass
+
+        for name, price, rating, link in rows:
             try:
                 cursor.execute(insert_query, (name, price, rating, link))
                 self.conn.commit()
+                self._note_write(table_name)
                 if cursor.rowcount > 0:
                     inserted_count += 1
             except (MySQL_Error, snowflake.connector.errors.ProgrammingError) as e:
@@ -220,33 +473,116 @@ class DatabaseConnector:
                     pass
                 else:
                     print(f"Error inserting product '{name}' into {table_name} (Link: {link}): {e}")
+                    failed_count += 1
                     self.conn.rollback()
             except Exception as e:
                 print(f"An unexpected error occurred inserting product '{name}' into {table_name}: {e}")
-                self.conn.rollback()
-        print(f"Attempted to insert {len(products_data)} products into {table_name}. Successfully inserted/ignored {inserted_count} new products.")
-        cursor.close()
+                failed_count += 1
+                try:
+                    self.conn.rollback()
+                except Exception:
+                    pass
+        print(f"Attempted to insert {len(rows)} products into {table_name}. Successfully inserted/ignored {inserted_count} new products, {failed_count} failed.")
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        self.register_links([row[3] for row in rows])
+        return inserted_count, failed_count
 
     def fetch_products_from_table(self, table_name):
         '''Fetches all products from the specified table.'''
-        if not self.conn or not self.conn.is_connected():
-            print(f"No active database connection to fetch products from {table_name}.")
-            return []
-
-        cursor = self.conn.cursor(dictionary=True) if self.db_type == 'mysql' else self.conn.cursor()
         try:
-            cursor.execute(f"SELECT name, price, rating, link FROM {table_name}")
-            if self.db_type == 'mysql':
-                return cursor.fetchall()
-            elif self.db_type == 'snowflake':
-                columns = [col[0] for col in cursor.description]
-                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return self._run_read_query(f"SELECT name, price, rating, link FROM {table_name}", tables=(table_name,))
         except (MySQL_Error, snowflake.connector.errors.ProgrammingError) as e:
             print(f"Error fetching products from {table_name}: {e}")
             return []
+        except ConnectionError:
+            raise
         except Exception as e:
             print(f"An unexpected error occurred fetching products from {table_name}: {e}")
             return []
+
+    def create_staging_table(self, table_name):
+        '''Creates an empty copy of a product table to rebuild into; returns its name, or None on failure.'''
+        if not self.conn or not self.conn.is_connected():
+            print(f"No active database connection to create a staging table for {table_name}.")
+            return None
+
+        # Unique per rebuild, so concurrent rebuilds of the same table never drop each other's staging table
+        staging_name = f"{table_name}_staging_{uuid.uuid4().hex[:8]}"
+        cursor = self.conn.cursor()
+        try:
+            if self.db_type == 'mysql':
+                cursor.execute(f"CREATE TABLE {staging_name} LIKE {table_name}")
+            elif self.db_type == 'snowflake':
+                cursor.execute(f"CREATE OR REPLACE TABLE {staging_name} LIKE {table_name}")
+            self.conn.commit()
+            return staging_name
+        except (MySQL_Error, snowflake.connector.errors.ProgrammingError) as e:
+            print(f"Error creating staging table for {table_name}: {e}")
+            return None
+        except Exception as e:
+            print(f"An unexpected error occurred creating staging table for {table_name}: {e}")
+            return None
+        finally:
+            cursor.close()
+
+    def swap_in_staging_table(self, table_name, staging_name):
+        '''Atomically replaces a product table with the given staging copy and drops the old data.'''
+        if not self.conn or not self.conn.is_connected():
+            print(f"No active database connection to swap in the staging table for {table_name}.")
+            return False
+
+        old_name = f"{table_name}_old_{staging_name.rsplit('_', 1)[-1]}"
+        cursor = self.conn.cursor()
+        try:
+            if self.db_type == 'mysql':
+                # A multi-table RENAME is atomic: readers see either the old or the new table, never neither
+                cursor.execute(f"RENAME TABLE {table_name} TO {old_name}, {staging_name} TO {table_name}")
+            elif self.db_type == 'snowflake':
+                # After the swap, staging_name holds the old data
+                cursor.execute(f"ALTER TABLE {table_name} SWAP WITH {staging_name}")
+                old_name = staging_name
+            self.conn.commit()
+            self._note_write(table_name)
+            print(f"Rebuilt {table_name} from {staging_name}.")
+        except (MySQL_Error, snowflake.connector.errors.ProgrammingError) as e:
+            print(f"Error swapping in staging table for {table_name}: {e}")
+            cursor.close()
+            return False
+        except Exception as e:
+            print(f"An unexpected error occurred swapping in staging table for {table_name}: {e}")
+            cursor.close()
+            return False
+
+        # The rebuild is live at this point; failing to drop the old data only leaves a table to clean up
+        try:
+            cursor.execute(f"DROP TABLE IF EXISTS {old_name}")
+            self.conn.commit()
+        except (MySQL_Error, snowflake.connector.errors.ProgrammingError) as e:
+            print(f"Error dropping old table {old_name} after rebuilding {table_name}: {e}")
+        finally:
+            cursor.close()
+        return True
+
+    def drop_staging_table(self, staging_name):
+        '''Discards an abandoned rebuild (a table returned by create_staging_table).'''
+        if not self.conn or not self.conn.is_connected():
+            print(f"No active database connection to drop the staging table {staging_name}.")
+            return False
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"DROP TABLE IF EXISTS {staging_name}")
+            self.conn.commit()
+            return True
+        except (MySQL_Error, snowflake.connector.errors.ProgrammingError) as e:
+            print(f"Error dropping staging table {staging_name}: {e}")
+            return False
+        except Exception as e:
+            print(f"An unexpected error occurred dropping staging table {staging_name}: {e}")
+            return False
         finally:
             cursor.close()
 
@@ -264,6 +600,7 @@ class DatabaseConnector:
             elif self.db_type == 'snowflake':
                 cursor.execute("INSERT INTO scrape_urls (url, description) VALUES (%s, %s)", (url, description))
             self.conn.commit()
+            self._note_write('scrape_urls')
             if cursor.rowcount > 0:
                 print(f"URL '{url}' added to scrape_urls.")
                 return True
@@ -288,26 +625,16 @@ class DatabaseConnector:
 
     def get_all_scrape_urls(self):
         '''Fetches all URLs from the scrape_urls table.'''
-        if not self.conn or not self.conn.is_connected():
-            print("No active database connection to fetch URLs.")
-            return []
-
-        cursor = self.conn.cursor(dictionary=True) if self.db_type == 'mysql' else self.conn.cursor()
         try:
-            cursor.execute("SELECT id, url, description, last_scraped_at FROM scrape_urls")
-            if self.db_type == 'mysql':
-                return cursor.fetchall()
-            elif self.db_type == 'snowflake':
-                columns = [col[0] for col in cursor.description]
-                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return self._run_read_query("SELECT id, url, description, last_scraped_at FROM scrape_urls", tables=('scrape_urls',))
         except (MySQL_Error, snowflake.connector.errors.ProgrammingError) as e:
             print(f"Error fetching scrape URLs: {e}")
             return []
+        except ConnectionError:
+            raise
         except Exception as e:
             print(f"An unexpected error occurred fetching scrape URLs: {e}")
             return []
-        finally:
-            cursor.close()
 
     def delete_scrape_url(self, url_id):
         '''Deletes a URL from the scrape_urls table by ID.'''
@@ -322,6 +649,7 @@ class DatabaseConnector:
             elif self.db_type == 'snowflake':
                 cursor.execute("DELETE FROM scrape_urls WHERE id = %s", (url_id,))
             self.conn.commit()
+            self._note_write('scrape_urls')
             if cursor.rowcount > 0:
                 print(f"URL with ID {url_id} deleted from scrape_urls.")
                 return True
@@ -359,6 +687,7 @@ class DatabaseConnector:
                     (current_timestamp, url_id)
                 )
             self.conn.commit()
+            self._note_write('scrape_urls')
             if cursor.rowcount > 0:
                 return True
             else:
@@ -375,3 +704,119 @@ class DatabaseConnector:
         finally:
             cursor.close()
 
+    # --- Methods for link_health table ---
+    def register_links(self, links):
+        '''Starts tracking the health of the given links; already tracked links are left untouched.'''
+        if not self.conn or not self.conn.is_connected():
+            print("No active database connection to register links.")
+            return
+
+        new_links = [link for link in set(links) if link and link != 'N/A']
+        if not new_links:
+            return
+
+        cursor = self.conn.cursor()
+        try:
+            if self.db_type == 'mysql':
+                cursor.executemany("INSERT IGNORE INTO link_health (link) VALUES (%s)", [(link,) for link in new_links])
+            elif self.db_type == 'snowflake':
+                # The Snowflake connector only batches INSERTs, so merge each chunk with a single statement
+                for i in range(0, len(new_links), 1000):
+                    chunk = new_links[i:i + 1000]
+                    values = ", ".join(["(%s)"] * len(chunk))
+                    cursor.execute(
+                        f"MERGE INTO link_health t USING (SELECT column1 AS link FROM VALUES {values}) s "
+                        "ON t.link = s.link WHEN NOT MATCHED THEN INSERT (link) VALUES (s.link)",
+                        chunk
+                    )
+            self.conn.commit()
+            self._note_write('link_health')
+        except (MySQL_Error, snowflake.connector.errors.ProgrammingError) as e:
+            print(f"Error registering links for health tracking: {e}")
+            self.conn.rollback()
+        except Exception as e:
+            print(f"An unexpected error occurred registering links for health tracking: {e}")
+            self.conn.rollback()
+        finally:
+            cursor.close()
+
+    def get_links_due_for_check(self, limit=500):
+        '''Fetches up to `limit` tracked links whose next_check_at has passed, most overdue first.'''
+        if not self.conn or not self.conn.is_connected():
+            print("No active database connection to fetch links due for checking.")
+            return []
+
+        cursor = self.conn.cursor(dictionary=True) if self.db_type == 'mysql' else self.conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT link, consecutive_failures, check_interval_seconds FROM link_health "
+                "WHERE next_check_at <= %s ORDER BY next_check_at LIMIT %s",
+                (datetime.now(), limit)
+            )
+            if self.db_type == 'mysql':
+                return cursor.fetchall()
+            elif self.db_type == 'snowflake':
+                columns = [col[0].lower() for col in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except (MySQL_Error, snowflake.connector.errors.ProgrammingError) as e:
+            print(f"Error fetching links due for checking: {e}")
+            return []
+        except Exception as e:
+            print(f"An unexpected error occurred fetching links due for checking: {e}")
+            return []
+        finally:
+            cursor.close()
+
+    def update_link_health(self, health_updates):
+        '''Stores check outcomes; each update is a dict as returned by util.url_checker.schedule_next_check.'''
+        if not self.conn or not self.conn.is_connected():
+            print("No active database connection to update link health.")
+            return False
+        if not health_updates:
+            return True
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany(
+                "UPDATE link_health SET last_status_code = %s, is_working = %s, last_error = %s, "
+                "last_checked_at = %s, consecutive_failures = %s, check_interval_seconds = %s, next_check_at = %s "
+                "WHERE link = %s",
+                [
+                    (u['last_status_code'], u['is_working'], u['last_error'], u['last_checked_at'],
+                     u['consecutive_failures'], u['check_interval_seconds'], u['next_check_at'], u['link'])
+                    for u in health_updates
+                ]
+            )
+            self.conn.commit()
+            self._note_write('link_health')
+            return True
+        except (MySQL_Error, snowflake.connector.errors.ProgrammingError) as e:
+            print(f"Error updating link health: {e}")
+            self.conn.rollback()
+            return False
+        except Exception as e:
+            print(f"An unexpected error occurred updating link health: {e}")
+            self.conn.rollback()
+            return False
+        finally:
+            cursor.close()
+
+    def get_dead_links(self, min_consecutive_failures=1, limit=100, offset=0):
+        '''Fetches links whose last check failed at least `min_consecutive_failures` times in a row.'''
+        try:
+            return self._run_read_query(
+                "SELECT link, last_status_code, last_error, last_checked_at, consecutive_failures, next_check_at "
+                "FROM link_health WHERE is_working = FALSE AND consecutive_failures >= %s "
+                "ORDER BY consecutive_failures DESC, last_checked_at DESC LIMIT %s OFFSET %s",
+                (min_consecutive_failures, limit, offset),
+                tables=('link_health',),
+                lowercase_columns=True
+            )
+        except (MySQL_Error, snowflake.connector.errors.ProgrammingError) as e:
+            print(f"Error fetching dead links: {e}")
+            return []
+        except ConnectionError:
+            raise
+        except Exception as e:
+            print(f"An unexpected error occurred fetching dead links: {e}")
+            return []
@@ -0,0 +1,129 @@
+import json
+import mmap
+import os
+import threading
+import zlib
+from collections import deque
+from datetime import datetime
+
+from model.amazon_scraper import parse_products_html
+from model.parse_pool import get_parse_pool, PARSE_POOL_WORKERS
+
+SEGMENT_FILENAME = "pages.seg"
+INDEX_FILENAME = "pages.idx"
+
+class PageArchive:
+    '''
+    Append-only store of raw fetched pages.
+    Pages are zlib-compressed and appended to a single segment file; an index file holds one JSON line
+    per page with the URL and the (offset, length) of its record, so pages can be read back via mmap.
+    '''
+
+    def __init__(self, directory, compression_level=6):
+        self.directory = directory
+        self.segment_path = os.path.join(directory, SEGMENT_FILENAME)
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, url, content):
+        '''Stores a fetched page and returns its index entry.'''
+        record = zlib.compress(content, self.compression_level)
+        with self._lock:
+            try:
+                with open(self.segment_path, "ab") as segment:
+                    offset = segment.tell()
+                    segment.write(record)
+                entry = {
+                    "url": url,
+                    "offset": offset,
+                    "length": len(record),
+                    "fetched_at": datetime.now().isoformat()
+                }
+                with open(self.index_path, "a+b") as index:
+                    # Terminate a torn last line first, otherwise this entry would be glued onto it and lost too
+                    if index.seek(0, os.SEEK_END) > 0:
+                        index.seek(-1, os.SEEK_END)
+                        if index.read(1) != b"\n":
+                            index.write(b"\n")
+                    index.write((json.dumps(entry) + "\n").encode())
+                return entry
+            except IOError as e:
+                print(f"Error archiving page for URL: {url} - {e}")
+                return None
+
+    def entries(self, latest_only=True):
+        '''Returns the index entries; with latest_only, only the most recent fetch of each URL.'''
+        if not os.path.exists(self.index_path):
+            return []
+        entries = []
+        with open(self.index_path) as index:
+            for line in index:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # A torn last line from an interrupted append; the page it points to is simply skipped
+                    continue
+        if latest_only:
+            entries = list({entry["url"]: entry for entry in entries}.values())
+        return entries
+
+    def read(self, entry):
+        '''Returns the raw content of a single archived page.'''
+        with open(self.segment_path, "rb") as segment:
+            with mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return zlib.decompress(mm[entry["offset"]:entry["offset"] + entry["length"]])
+
+def _parse_archived_pages(segment_path, entries):
+    '''Worker: parses a chunk of archived pages, reading them straight from the memory-mapped segment.'''
+    products = []
+    with open(segment_path, "rb") as segment:
+        with mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for entry in entries:
+                try:
+                    content = zlib.decompress(mm[entry["offset"]:entry["offset"] + entry["length"]])
+                except zlib.error as e:
+                    print(f"Error reading archived page for URL: {entry['url']} - {e}")
+                    continue
+                products.extend(parse_products_html(content))
+    return products
+
+def reparse_archive(archive, chunk_size=20):
+    '''
+    Re-runs the product parser over every archived page in parallel (shared parse pool), without touching the network.
+    Yields each distinct product (by link).
+    '''
+    entries = archive.entries()
+    if not entries or not os.path.exists(archive.segment_path) or os.path.getsize(archive.segment_path) == 0:
+        return
+
+    # Offset order keeps each worker reading a contiguous region of the segment
+    entries.sort(key=lambda entry: entry["offset"])
+    chunks = [entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size)]
+
+    seen_links = set()
+    executor = get_parse_pool()
+    # Keep only a bounded window of chunks in flight, so parsed results never pile up while the caller writes
+    max_in_flight = 2 * PARSE_POOL_WORKERS
+    pending_chunks = iter(chunks)
+    in_flight = deque()
+    try:
+        while True:
+            while len(in_flight) < max_in_flight:
+                chunk = next(pending_chunks, None)
+                if chunk is None:
+                    break
+                in_flight.append(executor.submit(_parse_archived_pages, archive.segment_path, chunk))
+            if not in_flight:
+                break
+            for product in in_flight.popleft().result():
+                link = product.get("Link")
+                if link != "N/A":
+                    if link in seen_links:
+                        continue
+                    seen_links.add(link)
+                yield product
+    finally:
+        for future in in_flight:
+            future.cancel()
@@ -0,0 +1,26 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+PARSE_POOL_WORKERS = os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_parse_pool():
+    '''
+    Returns the process pool shared by all HTML parsing work, starting it on first use.
+    Workers are started by a forkserver, so they are never forked from a Flask process with live request threads.
+    Each worker still imports the main script as __mp_main__, so the main script must keep its side effects
+    (DB connections, table creation) under its `if __name__ == '__main__':` guard, as app.py does.
+    '''
+    global _pool
+    with _pool_lock:
+        # A worker that died (e.g. killed by the OS) leaves the pool permanently broken; replace it
+        if _pool is None or getattr(_pool, '_broken', False):
+            context = multiprocessing.get_context("forkserver")
+            # Warm the forkserver with the parser so workers do not each import bs4 from scratch
+            context.set_forkserver_preload(["model.amazon_scraper"])
+            _pool = ProcessPoolExecutor(max_workers=PARSE_POOL_WORKERS, mp_context=context)
+        return _pool
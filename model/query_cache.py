@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISS = object()
+
+class QueryCache:
+    '''
+    In-memory cache of read query results keyed by (SQL, params).
+    Each entry remembers which tables it read, so a write to a table drops only the entries depending on it.
+    Entries also expire after `ttl_seconds` to bound staleness from writers outside this process.
+    Rows are copied on the way in and out, so callers can never modify what later cache hits return.
+    '''
+
+    MISS = _MISS
+
+    def __init__(self, ttl_seconds=60, max_entries=256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, tables, result), least recently used first
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query, params=None):
+        return (query, tuple(params or ()))
+
+    def get(self, key):
+        '''Returns a copy of the cached rows, or QueryCache.MISS.'''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISS
+            expires_at, _, result = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return _MISS
+            self._entries.move_to_end(key)
+        return [dict(row) for row in result]
+
+    def set(self, key, result, tables):
+        if self.max_entries <= 0:
+            return
+        result = tuple(dict(row) for row in result)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, frozenset(tables), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_table(self, table_name):
+        '''Drops every entry that read from table_name.'''
+        with self._lock:
+            for key in [key for key, (_, tables, _) in self._entries.items() if table_name in tables]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
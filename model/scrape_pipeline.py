@@ -0,0 +1,180 @@
+import queue
+import threading
+from collections import deque
+
+from model.amazon_scraper import parse_products_html
+from model.parse_pool import get_parse_pool, PARSE_POOL_WORKERS
+
+_DONE = object()  # Sentinel marking the end of a stage's output
+
+class ScrapePipeline:
+    '''
+    Runs a scrape as overlapping stages connected by bounded queues:
+    fetcher threads -> parser processes (shared pool) -> caller (generator) -> batching DB writer thread.
+    A full queue blocks the stage feeding it, so memory stays bounded however many pages are scraped.
+    '''
+
+    def __init__(self, scraper, db_connector, table_name='products', fetch_workers=4,
+                 batch_size=100, queue_size=32):
+        self.scraper = scraper
+        self.db_connector = db_connector
+        self.table_name = table_name
+        self.fetch_workers = fetch_workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.products_per_url = {}
+        self.write_error = None  # Set if the writer stage failed; products yielded after that were not stored
+
+    def _put(self, q, item, stop_event):
+        '''Blocks until there is room in the queue, giving up if the pipeline is being torn down.'''
+        while not stop_event.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q, stop_event):
+        '''Blocks until an item is available, returning _DONE if the pipeline is being torn down.'''
+        while not stop_event.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fetch_stage(self, url_queue, page_queue, max_pages, stop_event):
+        '''Fetcher thread: downloads every result page of each queued URL.'''
+        try:
+            while not stop_event.is_set():
+                try:
+                    url = url_queue.get_nowait()
+                except queue.Empty:
+                    break
+                for page_number, content in self.scraper.fetch_pages(url, max_pages):
+                    if not self._put(page_queue, (url, content), stop_event):
+                        return
+        except Exception as e:
+            print(f"An unexpected error occurred in scrape fetcher: {e}")
+        finally:
+            self._put(page_queue, _DONE, stop_event)
+
+    def _parse_stage(self, page_queue, product_queue, stop_event):
+        '''Dispatcher thread: feeds fetched pages to a process pool and forwards parsed products in order.'''
+        fetchers_done = 0
+        in_flight = deque()
+
+        def forward_oldest():
+            url, future = in_flight.popleft()
+            try:
+                products = future.result()
+            except Exception as e:
+                print(f"Error parsing a page from URL: {url} - {e}")
+                return True
+            for product in products:
+                if not self._put(product_queue, (url, product), stop_event):
+                    return False
+            return True
+
+        try:
+            executor = get_parse_pool()
+            max_in_flight = 2 * PARSE_POOL_WORKERS
+            while fetchers_done < self.fetch_workers and not stop_event.is_set():
+                item = self._get(page_queue, stop_event)
+                if item is _DONE:
+                    fetchers_done += 1
+                    continue
+                url, content = item
+                in_flight.append((url, executor.submit(parse_products_html, content)))
+                if len(in_flight) >= max_in_flight and not forward_oldest():
+                    return
+            while in_flight and not stop_event.is_set():
+                if not forward_oldest():
+                    return
+        except Exception as e:
+            print(f"An unexpected error occurred in scrape parser: {e}")
+        finally:
+            # The pool is shared, so drop work this run no longer needs instead of waiting for it
+            for _, future in in_flight:
+                future.cancel()
+            self._put(product_queue, _DONE, stop_event)
+
+    def _write_batch(self, batch):
+        '''Inserts one batch, raising if any product in it could not be stored.'''
+        _, failed_count = self.db_connector.insert_products_into_table(self.table_name, batch)
+        if failed_count:
+            raise RuntimeError(f"{failed_count} of {len(batch)} products could not be saved to '{self.table_name}'")
+
+    def _write_stage(self, write_queue, stop_event):
+        '''Writer thread: inserts products in batches of batch_size. On failure, stops the whole pipeline.'''
+        batch = []
+        try:
+            while True:
+                product = write_queue.get()
+                if product is _DONE:
+                    break
+                batch.append(product)
+                if len(batch) >= self.batch_size:
+                    self._write_batch(batch)
+                    batch = []
+            if batch:
+                self._write_batch(batch)
+        except Exception as e:
+            print(f"An unexpected error occurred in scrape writer: {e}")
+            self.write_error = e
+            stop_event.set()
+
+    def run(self, urls, max_pages=None):
+        '''
+        Scrapes every URL and yields each distinct product (by link) as soon as it is parsed.
+        Products are written to the database in the background; the write is complete once the generator is exhausted.
+        '''
+        self.products_per_url = {url: 0 for url in urls}
+        self.write_error = None
+        stop_event = threading.Event()
+        url_queue = queue.Queue()
+        page_queue = queue.Queue(maxsize=self.queue_size)
+        product_queue = queue.Queue(maxsize=self.queue_size * 8)
+        write_queue = queue.Queue(maxsize=self.batch_size * 2)
+        for url in urls:
+            url_queue.put(url)
+
+        fetchers = [
+            threading.Thread(target=self._fetch_stage, args=(url_queue, page_queue, max_pages, stop_event), daemon=True)
+            for _ in range(self.fetch_workers)
+        ]
+        parser = threading.Thread(target=self._parse_stage, args=(page_queue, product_queue, stop_event), daemon=True)
+        writer = threading.Thread(target=self._write_stage, args=(write_queue, stop_event), daemon=True)
+        for thread in fetchers + [parser, writer]:
+            thread.start()
+
+        seen_links = set()
+        try:
+            while True:
+                item = self._get(product_queue, stop_event)
+                if item is _DONE:
+                    break
+                url, product = item
+                link = product.get("Link")
+                if link != "N/A":
+                    if link in seen_links:
+                        continue
+                    seen_links.add(link)
+                if not self._put(write_queue, product, stop_event):
+                    break  # Writer failed
+                self.products_per_url[url] = self.products_per_url.get(url, 0) + 1
+                yield product
+        finally:
+            # Unblock upstream stages if we stopped early, then let a live writer flush what it already has
+            stop_event.set()
+            while writer.is_alive():
+                try:
+                    write_queue.put(_DONE, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+            writer.join()
+            parser.join()
+            for thread in fetchers:
+                thread.join()
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+# Used for any host without its own entry in the configuration
+DEFAULT_HOST_LIMITS = {
+    'rate': 2.0,                    # Requests per second allowed to the host
+    'burst': 5,                     # Requests that may go out back-to-back before rate applies
+    'failure_rate_threshold': 0.5,  # Fraction of failed requests in the window that opens the circuit
+    'min_requests': 10,             # Requests needed in the window before the circuit may open
+    'window_size': 20,              # Number of most recent outcomes considered
+    'reset_timeout': 30.0           # Seconds the circuit stays open before a trial request is allowed
+}
+
+class CircuitOpenError(Exception):
+    '''Raised when a request is short-circuited because its host's circuit breaker is open.'''
+
+    def __init__(self, host):
+        super().__init__(f"Circuit breaker open for host '{host}', request skipped.")
+        self.host = host
+
+class TokenBucket:
+    '''Thread-safe token bucket; callers reserve a token and are told how long to wait for it.'''
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        '''Takes a token, returning the seconds to wait before it may be used (0 if available now).'''
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        '''Blocks the calling thread until a token is available.'''
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        '''Waits for a token without blocking the event loop.'''
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+class CircuitBreaker:
+    '''
+    Opens when the failure rate over the last `window_size` outcomes reaches the threshold.
+    While open, requests are refused; after `reset_timeout` a single trial request decides whether to close again.
+
+    allow_request hands out a ticket that the caller passes back with the outcome. Every state change starts a
+    new generation, so late outcomes of requests sent before it (including an abandoned trial) are ignored.
+    '''
+
+    def __init__(self, failure_rate_threshold=0.5, min_requests=10, window_size=20, reset_timeout=30.0):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_requests = min_requests
+        self.reset_timeout = reset_timeout
+        self._outcomes = deque(maxlen=window_size)
+        self._opened_at = None
+        self._generation = 0
+        self._trial_ticket = None
+        self._trial_started_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def _open(self, now):
+        self._opened_at = now
+        self._trial_ticket = None
+        self._generation += 1
+
+    def allow_request(self):
+        '''Returns a ticket if a request may be sent now, or None if the circuit is open.'''
+        with self._lock:
+            if self._opened_at is None:
+                return self._generation
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                return None
+            if self._trial_ticket is not None and now - self._trial_started_at < self.reset_timeout:
+                return None
+            # Half-open: exactly one trial at a time; a trial that never reports back is replaced after reset_timeout
+            self._generation += 1
+            self._trial_ticket = self._generation
+            self._trial_started_at = now
+            return self._trial_ticket
+
+    def record_success(self, ticket):
+        with self._lock:
+            if ticket != self._generation:
+                return
+            if self._opened_at is None:
+                self._outcomes.append(True)
+            elif ticket == self._trial_ticket:
+                self._opened_at = None
+                self._trial_ticket = None
+                self._outcomes.clear()
+                self._generation += 1
+
+    def record_failure(self, ticket):
+        with self._lock:
+            if ticket != self._generation:
+                return
+            now = time.monotonic()
+            if self._opened_at is not None:
+                if ticket == self._trial_ticket:
+                    self._open(now)
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_requests and failures / len(self._outcomes) >= self.failure_rate_threshold:
+                self._open(now)
+                print(f"Circuit breaker opened after {failures} failures in the last {len(self._outcomes)} requests.")
+
+class HostThrottle:
+    '''
+    Per-host rate limiting and circuit breaking, shared by every component that makes outbound requests.
+    Config maps host names (or 'default') to overrides of DEFAULT_HOST_LIMITS.
+    '''
+
+    def __init__(self, config=None):
+        self._lock = threading.Lock()
+        self.configure(config)
+
+    def configure(self, config=None):
+        '''Replaces the limits for all hosts; existing per-host state is discarded.'''
+        config = dict(config or {})
+        default_limits = {**DEFAULT_HOST_LIMITS, **config.pop('default', {})}
+        with self._lock:
+            self._default_limits = default_limits
+            self._host_limits = {self._normalize_host(host): {**default_limits, **limits} for host, limits in config.items()}
+            self._buckets = {}
+            self._breakers = {}
+
+    @staticmethod
+    def _normalize_host(host):
+        host = host.lower()
+        return host[4:] if host.startswith("www.") else host
+
+    def host_for(self, url):
+        return self._normalize_host(urlparse(url).hostname or "")
+
+    def _get_state(self, host):
+        with self._lock:
+            if host not in self._buckets:
+                limits = self._host_limits.get(host, self._default_limits)
+                self._buckets[host] = TokenBucket(limits['rate'], limits['burst'])
+                self._breakers[host] = CircuitBreaker(
+                    failure_rate_threshold=limits['failure_rate_threshold'],
+                    min_requests=limits['min_requests'],
+                    window_size=limits['window_size'],
+                    reset_timeout=limits['reset_timeout']
+                )
+            return self._buckets[host], self._breakers[host]
+
+    def before_request(self, url):
+        '''
+        Blocks until a request to url's host is allowed and returns the ticket to pass to record_response.
+        Raises CircuitOpenError if the host's circuit is open.
+        '''
+        host = self.host_for(url)
+        bucket, breaker = self._get_state(host)
+        ticket = breaker.allow_request()
+        if ticket is None:
+            raise CircuitOpenError(host)
+        bucket.acquire()
+        return ticket
+
+    async def before_request_async(self, url):
+        '''Asyncio counterpart of before_request.'''
+        host = self.host_for(url)
+        bucket, breaker = self._get_state(host)
+        ticket = breaker.allow_request()
+        if ticket is None:
+            raise CircuitOpenError(host)
+        await bucket.acquire_async()
+        return ticket
+
+    def record_response(self, url, ticket, status_code=None):
+        '''Feeds a request outcome to the host's breaker. No status code (network error), 429 and 5xx count as failures.'''
+        _, breaker = self._get_state(self.host_for(url))
+        if status_code is None or status_code == 429 or status_code >= 500:
+            breaker.record_failure(ticket)
+        else:
+            breaker.record_success(ticket)
+
+# Shared instance used by the scraper and the link checker
+host_throttle = HostThrottle()
+
+def configure_rate_limits(config):
+    '''Applies deployment-specific per-host limits to the shared throttle.'''
+    host_throttle.configure(config)
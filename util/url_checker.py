@@ -1,16 +1,54 @@
 import requests
+from datetime import datetime, timedelta
+from util.rate_limiter import host_throttle, CircuitOpenError
+
+# Re-check schedule for tracked links (seconds)
+HEALTHY_MIN_INTERVAL = 24 * 3600        # A link that just recovered or was checked for the first time
+HEALTHY_MAX_INTERVAL = 30 * 24 * 3600   # Healthy links back off by doubling up to this
+FAILING_RETRY_INTERVAL = 3600           # Failing links are retried at this fixed pace
 
 def check_url_status(url):
     '''
     Checks the HTTP status of a given URL.
     Returns a dictionary with link, status_code, is_working, and error (if any).
+    'skipped' is set when the host's circuit breaker is open and no request was made.
     '''
+    try:
+        ticket = host_throttle.before_request(url)
+    except CircuitOpenError as e:
+        return {"link": url, "status_code": None, "is_working": False, "error": str(e), "skipped": True}
+
     try:
         response = requests.head(url, allow_redirects=True, timeout=5)
+        host_throttle.record_response(url, ticket, response.status_code)
         if 200 <= response.status_code < 300:
             return {"link": url, "status_code": response.status_code, "is_working": True}
         else:
             return {"link": url, "status_code": response.status_code, "is_working": False}
     except requests.exceptions.RequestException as e:
+        host_throttle.record_response(url, ticket, None)
         return {"link": url, "status_code": None, "is_working": False, "error": str(e)}
-    
+
+def schedule_next_check(result, previous_interval=0, consecutive_failures=0, checked_at=None):
+    '''
+    Turns a check_url_status result into a link_health update.
+    Healthy links wait twice as long as last time (bounded), failing links are retried soon.
+    '''
+    checked_at = checked_at or datetime.now()
+    if result["is_working"]:
+        interval = min(max(previous_interval * 2, HEALTHY_MIN_INTERVAL), HEALTHY_MAX_INTERVAL)
+        consecutive_failures = 0
+    else:
+        interval = FAILING_RETRY_INTERVAL
+        consecutive_failures += 1
+
+    return {
+        "link": result["link"],
+        "last_status_code": result["status_code"],
+        "is_working": result["is_working"],
+        "last_error": (result.get("error") or "")[:512] or None,
+        "last_checked_at": checked_at,
+        "consecutive_failures": consecutive_failures,
+        "check_interval_seconds": interval,
+        "next_check_at": checked_at + timedelta(seconds=interval)
+    }